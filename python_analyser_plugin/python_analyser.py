@@ -1,10 +1,28 @@
 import argparse
 import ast
+import codecs
 import fnmatch
+import hashlib
+import io
 import os
 from datetime import datetime
-from typing import Dict, Optional, override, List
+from itertools import repeat
+from operator import itemgetter
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Optional,
+    override,
+    List,
+    Set,
+    Tuple,
+)
 import logging
+import re
+import tokenize
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from visualiser.analyser.base import Analyser
 from visualiser.schema.data import (
@@ -17,12 +35,160 @@ from visualiser.schema.data import (
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# Projects with fewer Python files than this are analysed serially, as the process pool overhead would dominate
+PARALLEL_MIN_FILES: int = 16
+# Maximum number of files sent to a worker process at once
+PARALLEL_MAX_CHUNK_SIZE: int = 32
+# Number of chunks aimed for per worker process, so that all workers stay busy until the end
+PARALLEL_CHUNKS_PER_WORKER: int = 4
+# Files larger than this (e.g. generated code) are not parsed, only their total lines are counted
+MAX_ANALYSIS_FILE_SIZE: int = 2 * 1024 * 1024
+# Number of bytes at the start of a file searched for a null byte, to detect binary files
+BINARY_SNIFF_SIZE: int = 4096
+# Matches the first non-blank characters of a line, capturing a comment or triple quote start, or an empty string for blank lines
+LINE_START_RE: re.Pattern[bytes] = re.compile(
+    rb"^[^\S\n]*(#|\"\"\"|'''|\S|$)", re.MULTILINE
+)
+# Matches function definitions, including async ones, used to count methods in content which cannot be parsed
+DEF_RE: re.Pattern[bytes] = re.compile(
+    rb"^[ \t]*(?:async\s+)?def\s+[^\s(]+\s*\([^)]*\)[^:]*:\s*(?:#.*)?$",
+    re.MULTILINE,
+)
+# Characters which can prefix a string literal, e.g. r or b
+STRING_PREFIX_CHARACTERS: bytes = b"rRbBuUfF"
+# Delimiters of the strings which can span multiple lines without line continuations
+TRIPLE_QUOTES: Tuple[bytes, ...] = (b'"""', b"'''")
+# Matches a line continuation followed by a line starting with "#", which is usually inside a single-quoted string
+CONTINUED_COMMENT_RE: re.Pattern[bytes] = re.compile(rb"\\\r?\n[^\S\n]*#")
+# Tokens which neither hold code nor comments
+NON_CODE_TOKENS: FrozenSet[int] = frozenset(
+    {
+        tokenize.NL,
+        tokenize.INDENT,
+        tokenize.DEDENT,
+        tokenize.ENCODING,
+        tokenize.ENDMARKER,
+    }
+)
+# Folder metrics are only set when the installed feather-city schema defines them
+FOLDER_METRICS_SUPPORTED: bool = "metrics" in getattr(FolderNode, "model_fields", {})
+
+
+class FilenamePatterns:
+    """
+    Compiled set of fnmatch filename patterns, matched against both the name and the path of a file.
+    The patterns are split by kind, so that common patterns do not go through the regex engine:
+    literal names are looked up in a set, "*<suffix>" patterns are checked with a single str.endswith call,
+    and only the remaining patterns are combined into one regex.
+    """
+
+    WILDCARD_CHARACTERS: str = "*?["
+
+    def __init__(self, patterns: List[str]) -> None:
+        literal_names: Set[str] = set()
+        suffixes: List[str] = []
+        regex_patterns: List[str] = []
+
+        for pattern in patterns:
+            # fnmatch.fnmatch normalises the case of names and patterns, e.g. on Windows
+            pattern = os.path.normcase(pattern)
+            if not FilenamePatterns.__has_wildcards(pattern):
+                literal_names.add(pattern)
+            elif (
+                pattern.startswith("*")
+                and not FilenamePatterns.__has_wildcards(pattern[1:])
+                and "/" not in pattern
+                and os.sep not in pattern
+            ):
+                # Without separators, the path ends with the suffix exactly when the file name does
+                suffixes.append(pattern[1:])
+            else:
+                regex_patterns.append(pattern)
+
+        self.literal_names: FrozenSet[str] = frozenset(literal_names)
+        self.suffixes: Tuple[str, ...] = tuple(suffixes)
+        self.regex: Optional[re.Pattern[str]] = None
+        if regex_patterns:
+            self.regex = re.compile(
+                "|".join(
+                    f"(?:{fnmatch.translate(pattern)})" for pattern in regex_patterns
+                )
+            )
+
+    def matches(self, file_name: str, file_path: str) -> bool:
+        """
+        Check if the file name or the file path matches any of the patterns.
+        """
+        file_name = os.path.normcase(file_name)
+        file_path = os.path.normcase(file_path)
+        if file_name in self.literal_names or file_path in self.literal_names:
+            return True
+        if file_name.endswith(self.suffixes):
+            return True
+        return self.regex is not None and (
+            self.regex.match(file_name) is not None
+            or self.regex.match(file_path) is not None
+        )
+
+    @staticmethod
+    def __has_wildcards(pattern: str) -> bool:
+        """
+        Check if the pattern contains any fnmatch wildcard character.
+        """
+        return any(
+            character in pattern for character in FilenamePatterns.WILDCARD_CHARACTERS
+        )
+
+
+class StatementInspector(ast.NodeVisitor):
+    """
+    AST visitor counting function and method definitions and collecting the statements made of a single string
+    (docstrings, if nothing else is on their lines).
+    Both can only appear as statements, so only the statement blocks of each node are visited,
+    skipping the expressions which make up most of the tree.
+    """
+
+    # Fields of the AST nodes which hold statements, or clauses holding statements
+    STATEMENT_FIELDS: Tuple[str, ...] = (
+        "body",
+        "orelse",
+        "finalbody",
+        "handlers",
+        "cases",
+    )
+
+    def __init__(self) -> None:
+        self.function_count: int = 0
+        self.string_statements: List[ast.Expr] = []
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self.function_count += 1
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Expr(self, node: ast.Expr) -> None:
+        if isinstance(node.value, ast.Constant) and isinstance(
+            node.value.value, (str, bytes)
+        ):
+            self.string_statements.append(node)
+
+    @override
+    def generic_visit(self, node: ast.AST) -> None:
+        for field in StatementInspector.STATEMENT_FIELDS:
+            for child in getattr(node, field, ()):
+                self.visit(child)
+
 
 class PythonAnalyser(Analyser):
     """
     Python code analyser that counts lines of code, comments, and methods.
     """
 
+    # Metrics cache of a pool worker process, created when the worker starts and kept for the lifetime of the pool,
+    # which only serves a single analysis. Unused in the main process, where each analysis has its own cache.
+    __worker_metrics_cache: Dict[bytes, Dict[str, float]] = {}
+
     @override
     def analyse(
         self,
@@ -42,6 +208,7 @@ class PythonAnalyser(Analyser):
                 - exclude_directories: Comma-separated list of directory names to exclude
                 - exclude_filenames: Comma-separated list of filename patterns to exclude
                 - metrics: Comma-separated string of metric IDs to compute
+                - sorted: Whether the children of each folder are sorted by name (default True)
 
         Raises:
             ValueError: if the input directory does not exist, the provided metrics are invalid
@@ -56,6 +223,7 @@ class PythonAnalyser(Analyser):
         exclude_dirs_csv: str = kwargs.get("exclude_directories", "")
         exclude_files_csv: str = kwargs.get("exclude_filenames", "")
         requested_metrics_csv: str = kwargs.get("metrics", "")
+        sort_children: bool = kwargs.get("sorted", True)
 
         exclude_dirs_list: List[str] = PythonAnalyser.__parse_csv_param(
             exclude_dirs_csv
@@ -71,6 +239,11 @@ class PythonAnalyser(Analyser):
         logger.debug("Exclusion filename patterns: %s", exclude_files_list)
         logger.debug("Requested metrics: %s", requested_metric_ids)
 
+        exclude_dirs_set: FrozenSet[str] = frozenset(exclude_dirs_list)
+        exclude_files_patterns: Optional[FilenamePatterns] = (
+            FilenamePatterns(exclude_files_list) if exclude_files_list else None
+        )
+
         all_metrics = {
             "loc": MetricDef(
                 id="loc",
@@ -123,10 +296,25 @@ class PythonAnalyser(Analyser):
         else:
             metrics_to_compute = list(all_metrics.values())
 
-        hierarchy = PythonAnalyser.__build_hierarchy(
-            input_dir, input_dir, exclude_dirs_list, exclude_files_list
+        metric_ids: Tuple[str, ...] = tuple(
+            dict.fromkeys(metric.id for metric in metrics_to_compute)
         )
 
+        hierarchy: HierarchyNode
+        if os.path.isfile(input_dir):
+            # A single file is analysed directly
+            hierarchy = PythonAnalyser.__analyse_file(
+                input_dir, os.path.basename(input_dir), metric_ids, {}
+            )
+        else:
+            hierarchy = PythonAnalyser.__build_hierarchy(
+                input_dir,
+                exclude_dirs_set,
+                exclude_files_patterns,
+                sort_children,
+                metric_ids,
+            )
+
         project_title: str = title or os.path.basename(os.path.abspath(input_dir))
         project_description: str = description or f"Analysis of {project_title}"
         project_data: ProjectData = ProjectData(
@@ -149,215 +337,675 @@ class PythonAnalyser(Analyser):
         return [item.strip() for item in param.split(",") if item.strip()]
 
     @staticmethod
-    def __should_exclude_directory(dir_name: str, exclude_dirs_list: List[str]) -> bool:
-        """
-        Check if directory should be excluded based on the provided list.
-        """
-        if not exclude_dirs_list:
-            return False
-        is_excluded: bool = dir_name in exclude_dirs_list
-        if is_excluded:
-            logger.debug("Excluding directory by name: %s", dir_name)
-        return is_excluded
-
-    @staticmethod
-    def __should_exclude_file(file_path: str, exclude_files_list: List[str]) -> bool:
+    def __should_exclude_file(
+        file_name: str,
+        file_path: str,
+        exclude_files_patterns: Optional[FilenamePatterns],
+    ) -> bool:
         """
-        Check if file should be excluded based on exclude_filenames filter.
+        Check if file should be excluded based on the compiled exclude_filenames patterns.
         """
-        if not exclude_files_list:
+        if exclude_files_patterns is None:
             return False
 
-        file_name: str = os.path.basename(file_path)
-        for pattern in exclude_files_list:
-            if fnmatch.fnmatch(file_name, pattern) or fnmatch.fnmatch(
-                file_path, pattern
-            ):
-                logger.debug(
-                    "Excluding file '%s' due to pattern '%s'", file_path, pattern
-                )
-                return True
+        if exclude_files_patterns.matches(file_name, file_path):
+            logger.debug("Excluding file '%s' due to exclusion patterns", file_path)
+            return True
         return False
 
     @staticmethod
     def __build_hierarchy(
-        current_path: str,
         root_path: str,
-        exclude_dirs: List[str],
-        exclude_files: List[str],
+        exclude_dirs: FrozenSet[str],
+        exclude_files: Optional[FilenamePatterns],
+        sort_children: bool,
+        metric_ids: Tuple[str, ...],
     ) -> HierarchyNode:
         """
-        Recursively build the project hierarchy.
-        This method adheres to the original logic of returning HierarchyNode, and how children are processed and added.
+        Build the hierarchy of a project directory in three phases: scan the directory structure, calculate the
+        metrics of all discovered Python files (in parallel for larger projects), then create the hierarchy nodes.
+        """
+        file_paths: List[str] = []
+        scanned_root: Dict[str, Any] = PythonAnalyser.__scan_directory(
+            root_path, exclude_dirs, exclude_files, sort_children, file_paths
+        )
+        measurements: Dict[str, Optional[Tuple[Dict[str, float], str]]] = (
+            PythonAnalyser.__measure_files(file_paths, metric_ids)
+        )
+        return PythonAnalyser.__create_hierarchy(scanned_root, measurements, metric_ids)
+
+    @staticmethod
+    def __scan_directory(
+        root_path: str,
+        exclude_dirs: FrozenSet[str],
+        exclude_files: Optional[FilenamePatterns],
+        sort_children: bool,
+        file_paths: List[str],
+    ) -> Dict[str, Any]:
+        """
+        Scan a directory into an intermediate tree of plain dicts, without analysing any file.
+        The paths of the Python files found are appended to file_paths.
+        Only the kept children are sorted by name, if requested, rather than the whole directory listing.
+        Directories are walked with an explicit stack instead of recursion, so deep trees cannot hit the recursion
+        limit: each folder is pushed back once expanded, and completed when popped again after all its subfolders.
         """
-        rel_name: str = os.path.basename(current_path)
+        root_folder: Dict[str, Any] = {
+            "type": "folder",
+            "name": os.path.basename(root_path),
+            "children": [],
+        }
+        # Items are (path, folder, children list of the parent folder, whether the folder was already expanded)
+        stack: List[
+            Tuple[str, Dict[str, Any], Optional[List[Dict[str, Any]]], bool]
+        ] = [(root_path, root_folder, None, False)]
+
+        while stack:
+            current_path, folder, parent_children, expanded = stack.pop()
+            children: List[Dict[str, Any]] = folder["children"]
+
+            if expanded:
+                # All subfolders are complete, only non-empty folders are kept
+                if sort_children:
+                    children.sort(key=itemgetter("name"))
+                if parent_children is not None and children:
+                    parent_children.append(folder)
+                continue
+
+            stack.append((current_path, folder, parent_children, True))
+            try:
+                # DirEntry caches the file type from the directory listing, so no extra stat() calls are needed
+                with os.scandir(current_path) as entries:
+                    for entry in entries:
+                        # Skip hidden files and directories
+                        if entry.name.startswith("."):
+                            logger.debug("Skipping hidden item: %s", entry.path)
+                            continue
+
+                        # Symlinked directories are not followed as they can create cycles, symlinked files are
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name in exclude_dirs:
+                                logger.debug(
+                                    "Skipping excluded directory: %s", entry.path
+                                )
+                                continue
+                            child_folder: Dict[str, Any] = {
+                                "type": "folder",
+                                "name": entry.name,
+                                "children": [],
+                            }
+                            stack.append((entry.path, child_folder, children, False))
+
+                        elif entry.is_file():
+                            # Check for exclusion before scheduling the file for analysis
+                            if PythonAnalyser.__should_exclude_file(
+                                entry.name, entry.path, exclude_files
+                            ):
+                                continue
+
+                            if entry.name.endswith(".py"):
+                                children.append(
+                                    {
+                                        "type": "file",
+                                        "name": entry.name,
+                                        "path": entry.path,
+                                    }
+                                )
+                                file_paths.append(entry.path)
+
+            except PermissionError:
+                logger.warning(
+                    "Permission denied for directory: %s. Skipping.", current_path
+                )
+            except Exception as exception:
+                logger.warning(
+                    "Error processing directory %s: %s. Skipping.",
+                    current_path,
+                    exception,
+                    exc_info=True,
+                )
 
-        # If current_path is a file, analyse it directly
-        if os.path.isfile(current_path):
-            return PythonAnalyser.__analyse_file(current_path, rel_name)
+        return root_folder
 
-        # current_path is a directory
-        children: List[HierarchyNode] = []
+    @staticmethod
+    def __measure_files(
+        file_paths: List[str],
+        metric_ids: Tuple[str, ...],
+    ) -> Dict[str, Optional[Tuple[Dict[str, float], str]]]:
+        """
+        Calculate the metrics and read the last modification time of the given files, mapped by file path.
+        Projects with enough files are analysed in a process pool, smaller ones serially to avoid the pool overhead.
+        Identical contents are measured once per analysis when serial, and once per worker process in the pool.
+        """
+        if len(file_paths) < PARALLEL_MIN_FILES:
+            return PythonAnalyser.__measure_files_serially(file_paths, metric_ids)
+
+        # The chunk size follows the project size, so that smaller projects are still spread over all the workers,
+        # of which the pool starts one per CPU by default
+        worker_count: int = os.cpu_count() or 1
+        chunk_size: int = max(
+            1,
+            min(
+                PARALLEL_MAX_CHUNK_SIZE,
+                len(file_paths) // (worker_count * PARALLEL_CHUNKS_PER_WORKER),
+            ),
+        )
         try:
-            for item_name in sorted(os.listdir(current_path)):
-                item_path: str = os.path.join(current_path, item_name)
-
-                # Skip hidden files and directories
-                if item_name.startswith("."):
-                    logger.debug("Skipping hidden item: %s", item_path)
-                    continue
-
-                if os.path.isdir(item_path):
-                    if PythonAnalyser.__should_exclude_directory(
-                        item_name, exclude_dirs
-                    ):
-                        continue
-
-                    child_node: FolderNode = PythonAnalyser.__build_hierarchy(
-                        item_path, root_path, exclude_dirs, exclude_files
+            with ProcessPoolExecutor(
+                initializer=PythonAnalyser._init_worker
+            ) as executor:
+                return dict(
+                    zip(
+                        file_paths,
+                        executor.map(
+                            PythonAnalyser._measure_file_in_worker,
+                            file_paths,
+                            repeat(metric_ids),
+                            chunksize=chunk_size,
+                        ),
                     )
-                    if child_node.type == "folder" and child_node.children:
-                        children.append(child_node)
-
-                elif os.path.isfile(item_path):
-                    # Check for exclusion before attempting to build hierarchy for the file
-                    if PythonAnalyser.__should_exclude_file(item_path, exclude_files):
-                        continue
-
-                    if item_name.endswith(".py"):
-                        # Recursively call _build_hierarchy, which will then call _analyse_file
-                        file_child_node: FileNode = PythonAnalyser.__build_hierarchy(
-                            item_path, root_path, exclude_dirs, exclude_files
-                        )
-                        children.append(file_child_node)
-
-        except PermissionError:
-            logger.warning(
-                "Permission denied for directory: %s. Skipping.", current_path
-            )
-        except Exception as exception:
+                )
+        except (OSError, BrokenProcessPool) as exception:
             logger.warning(
-                "Error processing directory %s: %s. Skipping.",
-                current_path,
+                "Parallel analysis failed: %s. Falling back to serial analysis.",
                 exception,
-                exc_info=True,
+            )
+            return PythonAnalyser.__measure_files_serially(file_paths, metric_ids)
+
+    @staticmethod
+    def __measure_files_serially(
+        file_paths: List[str],
+        metric_ids: Tuple[str, ...],
+    ) -> Dict[str, Optional[Tuple[Dict[str, float], str]]]:
+        """
+        Calculate the metrics and read the last modification time of the given files in this process,
+        sharing a metrics cache between the files.
+        """
+        metrics_cache: Dict[bytes, Dict[str, float]] = {}
+        return {
+            file_path: PythonAnalyser.__measure_file(
+                file_path, metric_ids, metrics_cache
+            )
+            for file_path in file_paths
+        }
+
+    @staticmethod
+    def _init_worker() -> None:
+        """
+        Give a new pool worker process an empty metrics cache.
+        Not name-mangled, so that it can be pickled and sent to the worker processes.
+        """
+        PythonAnalyser.__worker_metrics_cache = {}
+
+    @staticmethod
+    def _measure_file_in_worker(
+        file_path: str, metric_ids: Tuple[str, ...]
+    ) -> Optional[Tuple[Dict[str, float], str]]:
+        """
+        Measure a file in a pool worker process, using the metrics cache of the worker.
+        Not name-mangled, so that it can be pickled and sent to the worker processes.
+        """
+        return PythonAnalyser.__measure_file(
+            file_path, metric_ids, PythonAnalyser.__worker_metrics_cache
+        )
+
+    @staticmethod
+    def __create_hierarchy(
+        scanned_root: Dict[str, Any],
+        measurements: Dict[str, Optional[Tuple[Dict[str, float], str]]],
+        metric_ids: Tuple[str, ...],
+    ) -> HierarchyNode:
+        """
+        Create the hierarchy nodes from the scanned tree and the file measurements.
+        Folders are collected in pre-order with an explicit stack, then created in reverse order,
+        so the nodes of all subfolders exist before their parent is created.
+        The nodes are built with model_construct, skipping the validation of data computed by this analyser.
+        """
+        folders: List[Dict[str, Any]] = []
+        stack: List[Dict[str, Any]] = [scanned_root]
+        while stack:
+            folder: Dict[str, Any] = stack.pop()
+            folders.append(folder)
+            stack.extend(
+                child for child in folder["children"] if child["type"] == "folder"
             )
 
-        return FolderNode(name=rel_name, type="folder", children=children)
+        for folder in reversed(folders):
+            children: List[HierarchyNode] = [
+                (
+                    child["node"]
+                    if child["type"] == "folder"
+                    else PythonAnalyser.__create_file_node(
+                        child["name"], measurements[child["path"]], metric_ids
+                    )
+                )
+                for child in folder["children"]
+            ]
+            folder["node"] = PythonAnalyser.__create_folder_node(
+                folder["name"], children
+            )
+
+        return scanned_root["node"]
 
     @staticmethod
-    def __analyse_file(file_path: str, file_name: str) -> FileNode:
+    def __create_folder_node(
+        folder_name: str, children: List[HierarchyNode]
+    ) -> FolderNode:
+        """
+        Create the node of a folder from its already created children.
+        The node is built with model_construct, skipping the validation of data computed by this analyser.
+        """
+        if not FOLDER_METRICS_SUPPORTED:
+            return FolderNode.model_construct(
+                name=folder_name, type="folder", children=children
+            )
+
+        # Sum the metrics of the children while they are created, instead of in a second traversal
+        folder_metrics: Dict[str, float] = {}
+        for child in children:
+            for metric_id, value in child.metrics.items():
+                folder_metrics[metric_id] = folder_metrics.get(metric_id, 0.0) + value
+        return FolderNode.model_construct(
+            name=folder_name,
+            type="folder",
+            children=children,
+            metrics=folder_metrics,
+        )
+
+    @staticmethod
+    def __analyse_file(
+        file_path: str,
+        file_name: str,
+        metric_ids: Tuple[str, ...],
+        metrics_cache: Dict[bytes, Dict[str, float]],
+    ) -> FileNode:
         """
         Analyse a single file. If not a Python file or an error was raised, returns FileNode with zero/default metrics.
         """
+        return PythonAnalyser.__create_file_node(
+            file_name,
+            PythonAnalyser.__measure_file(file_path, metric_ids, metrics_cache),
+            metric_ids,
+        )
+
+    @staticmethod
+    def __measure_file(
+        file_path: str,
+        metric_ids: Tuple[str, ...],
+        metrics_cache: Dict[bytes, Dict[str, float]],
+    ) -> Optional[Tuple[Dict[str, float], str]]:
+        """
+        Read a file and calculate the requested metrics, returning them with the last modification time of the file,
+        or None if the file could not be analysed.
+        """
         logger.debug("Analyzing file: %s", file_path)
         try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as file_data:
-                content = file_data.read()
-
-            last_mod_time: str = datetime.fromtimestamp(
-                os.path.getmtime(file_path)
-            ).isoformat()
+            # Read raw bytes, the tokenizer and the parser decode them following the PEP 263 encoding declaration
+            with open(file_path, "rb") as file_data:
+                # The modification time comes from the stat call of the open file
+                file_stat: os.stat_result = os.fstat(file_data.fileno())
+                content: bytes = file_data.read()
+            metrics_data: Dict[str, float] = PythonAnalyser.__measure_content(
+                file_path, content, metric_ids, metrics_cache
+            )
 
-            # Calculate metrics
-            metrics_data: Dict[str, float] = PythonAnalyser.__calculate_metrics(content)
+            last_mod_time: str = datetime.fromtimestamp(file_stat.st_mtime).isoformat()
 
             logger.debug("File analysis completed for: %s", file_path)
-            return FileNode(
-                name=file_name,
-                type="file",
-                language="python",
-                lastModified=last_mod_time,
-                metrics=metrics_data,
-                uses=[],
-                usedBy=[],
-            )
+            return metrics_data, last_mod_time
         except Exception as exception:
             logger.warning(
                 "Failed to analyse file %s: %s", file_path, exception, exc_info=True
             )
-            # Return a file node with zero metrics
-            return FileNode(
+            return None
+
+    @staticmethod
+    def __create_file_node(
+        file_name: str,
+        measurement: Optional[Tuple[Dict[str, float], str]],
+        metric_ids: Tuple[str, ...],
+    ) -> FileNode:
+        """
+        Create the node of an analysed file from its metrics and last modification time.
+        If the file could not be analysed, the node has zero/default metrics.
+        The node is built with model_construct, skipping the validation of data computed by this analyser.
+        """
+        if measurement is not None:
+            metrics_data, last_mod_time = measurement
+            return FileNode.model_construct(
                 name=file_name,
                 type="file",
                 language="python",
-                lastModified=datetime.now().isoformat(),
-                metrics={"loc": 0, "cloc": 0, "nom": 0, "tloc": 0,},
+                lastModified=last_mod_time,
+                metrics=metrics_data,
                 uses=[],
                 usedBy=[],
             )
 
+        # Return a file node with zero metrics
+        return FileNode.model_construct(
+            name=file_name,
+            type="file",
+            language="python",
+            lastModified=datetime.now().isoformat(),
+            metrics={metric_id: 0.0 for metric_id in metric_ids},
+            uses=[],
+            usedBy=[],
+        )
+
+    @staticmethod
+    def __measure_content(
+        file_path: str,
+        content: bytes,
+        metric_ids: Tuple[str, ...],
+        metrics_cache: Dict[bytes, Dict[str, float]],
+    ) -> Dict[str, float]:
+        """
+        Calculate the requested metrics for the content of a file, bailing out early on files not worth parsing:
+        binary files (with a null byte at the start) get zero metrics, and files larger than MAX_ANALYSIS_FILE_SIZE
+        (e.g. generated code) only get their total lines counted.
+        """
+        if content.find(b"\0", 0, BINARY_SNIFF_SIZE) != -1:
+            logger.warning("Skipping binary file: %s", file_path)
+            return {metric_id: 0.0 for metric_id in metric_ids}
+
+        if len(content) > MAX_ANALYSIS_FILE_SIZE:
+            logger.warning(
+                "File %s is larger than %d bytes, only counting its total lines",
+                file_path,
+                MAX_ANALYSIS_FILE_SIZE,
+            )
+            return {
+                metric_id: (
+                    float(content.count(b"\n") + 1) if metric_id == "tloc" else 0.0
+                )
+                for metric_id in metric_ids
+            }
+
+        return PythonAnalyser.__calculate_deduplicated_metrics(
+            content, metric_ids, metrics_cache
+        )
+
+    @staticmethod
+    def __calculate_deduplicated_metrics(
+        content: bytes,
+        metric_ids: Tuple[str, ...],
+        metrics_cache: Dict[bytes, Dict[str, float]],
+    ) -> Dict[str, float]:
+        """
+        Calculate metrics for Python code content, reusing the metrics of any identical content found in
+        metrics_cache, so duplicated files (e.g. empty __init__.py files, vendored copies) are only parsed once per
+        cache. Hashing the content is much cheaper than tokenizing and parsing it.
+        Each cache only serves a single analysis, so the requested metrics are the same for all of its entries.
+        """
+        content_digest: bytes = hashlib.blake2b(content, digest_size=16).digest()
+        metrics_data: Optional[Dict[str, float]] = metrics_cache.get(content_digest)
+        if metrics_data is None:
+            metrics_data = PythonAnalyser.__calculate_metrics(content, metric_ids)
+            metrics_cache[content_digest] = metrics_data
+        # Copy the cached result so that nodes never share it
+        return dict(metrics_data)
+
     @staticmethod
-    def __calculate_metrics(content: str) -> Dict[str, float]:
+    def __calculate_metrics(
+        content: bytes, metric_ids: Tuple[str, ...]
+    ) -> Dict[str, float]:
         """
         Calculate metrics (lines of code, lines of comments, number of methods, total lines) for Python code content.
+        The content is parsed once: the AST gives both the method count and the docstrings, which correct a cheap
+        scan of the line starts. The tokenizer is only used for the rare lines the scan cannot classify.
+        Only the requested metrics are calculated: the AST parsing is skipped when only the total lines are requested.
+        """
+        metrics_data: Dict[str, float] = {}
+        try:
+            if "loc" in metric_ids or "cloc" in metric_ids or "nom" in metric_ids:
+                # Equivalent to ast.parse, without its wrapper call or inheriting the __future__ flags of this module
+                tree: ast.AST = compile(
+                    content,
+                    "<unknown>",
+                    "exec",
+                    flags=ast.PyCF_ONLY_AST,
+                    dont_inherit=True,
+                )
+                inspector: StatementInspector = StatementInspector()
+                inspector.visit(tree)
+                metrics_data["nom"] = float(inspector.function_count)
+
+                if "loc" in metric_ids or "cloc" in metric_ids:
+                    line_counts: Optional[Tuple[int, int]] = (
+                        PythonAnalyser.__count_code_and_comment_lines(
+                            content, tree, inspector.string_statements
+                        )
+                    )
+                    if line_counts is None:
+                        code_lines, comment_lines = PythonAnalyser.__classify_lines(
+                            content
+                        )
+                        line_counts = (
+                            len(code_lines),
+                            len(comment_lines - code_lines),
+                        )
+                    metrics_data["loc"] = float(line_counts[0])
+                    metrics_data["cloc"] = float(line_counts[1])
+        except (SyntaxError, tokenize.TokenError) as syntax_error:
+            # Fallback if tokenizing or AST parsing fails
+            logger.debug(
+                "AST parsing failed for content (likely not Python or syntax error): %s. Using line based scan.",
+                syntax_error,
+            )
+            metrics_data = PythonAnalyser.__calculate_metrics_from_lines(content)
+
+        if "tloc" in metric_ids:
+            metrics_data["tloc"] = float(content.count(b"\n") + 1)
+
+        return {metric_id: metrics_data[metric_id] for metric_id in metric_ids}
+
+    @staticmethod
+    def __count_code_and_comment_lines(
+        content: bytes,
+        tree: ast.AST,
+        string_statements: List[ast.Expr],
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Count the code lines and the comment lines of parsed Python code content.
+        Lines are first classified by their first non-blank characters, matched by LINE_START_RE, then corrected
+        with the AST: the lines of docstrings are comments, and the lines inside other multi-line strings are code,
+        even if blank or starting with "#". Other strings are only searched for when the content has more triple
+        quotes than its docstrings or a continued line starting with "#", as walking the whole AST costs about half
+        as much as parsing it.
+        Returns None for the rare content whose lines cannot be located this way (e.g. implicitly concatenated or
+        formatted strings with blank lines inside, or old Mac line endings), which is left to the tokenizer.
+        """
+        source: bytes = content
+        if source.startswith(codecs.BOM_UTF8):
+            # AST columns do not count the byte order mark
+            source = source[len(codecs.BOM_UTF8) :]
+        if source.count(b"\r") != source.count(b"\r\n"):
+            # Lone carriage returns end lines for the parser, but not for the line scan
+            return None
+        line_kinds: List[bytes] = LINE_START_RE.findall(source)
+        lines: List[bytes] = source.split(b"\n")
+
+        comment_lines_count: int = line_kinds.count(b"#")
+        code_lines_count: int = (
+            len(line_kinds) - line_kinds.count(b"") - comment_lines_count
+        )
+
+        docstring_values: Set[ast.expr] = set()
+        docstring_quotes_count: int = 0
+        for statement in string_statements:
+            value: ast.expr = statement.value
+            first_line: bytes = lines[statement.lineno - 1]
+            line_rest: bytes = lines[statement.end_lineno - 1][
+                statement.end_col_offset :
+            ].lstrip()
+            if (
+                # Parenthesized, or sharing its lines with code: the string is code
+                (value.lineno, value.col_offset)
+                != (statement.lineno, statement.col_offset)
+                or first_line[: statement.col_offset].strip()
+                or (line_rest and not line_rest.startswith(b"#"))
+            ):
+                continue
+
+            docstring_values.add(value)
+            if (
+                first_line[statement.col_offset :]
+                .lstrip(STRING_PREFIX_CHARACTERS)
+                .startswith(TRIPLE_QUOTES)
+            ):
+                docstring_quotes_count += 2
+            docstring_kinds: List[bytes] = line_kinds[
+                statement.lineno - 1 : statement.end_lineno
+            ]
+            docstring_comments_count: int = docstring_kinds.count(b"#")
+            code_lines_count -= (
+                len(docstring_kinds)
+                - docstring_kinds.count(b"")
+                - docstring_comments_count
+            )
+            comment_lines_count += len(docstring_kinds) - docstring_comments_count
+
+        if (
+            source.count(TRIPLE_QUOTES[0]) + source.count(TRIPLE_QUOTES[1])
+            == docstring_quotes_count
+            and CONTINUED_COMMENT_RE.search(source) is None
+        ):
+            return code_lines_count, comment_lines_count
+
+        for node in ast.walk(tree):
+            if (
+                not isinstance(node, (ast.Constant, ast.JoinedStr))
+                or node.end_lineno == node.lineno
+                or node in docstring_values
+            ):
+                continue
+            # The first line holds the opening quotes, the others may look blank or commented out
+            inner_kinds: List[bytes] = line_kinds[node.lineno : node.end_lineno]
+            inner_blank_count: int = inner_kinds.count(b"")
+            inner_comments_count: int = inner_kinds.count(b"#")
+            if not inner_blank_count and not inner_comments_count:
+                continue
+            if isinstance(
+                node, ast.JoinedStr
+            ) or not PythonAnalyser.__is_single_triple_quoted_string(lines, node):
+                return None
+            code_lines_count += inner_blank_count + inner_comments_count
+            comment_lines_count -= inner_comments_count
+
+        return code_lines_count, comment_lines_count
+
+    @staticmethod
+    def __is_single_triple_quoted_string(lines: List[bytes], node: ast.expr) -> bool:
+        """
+        Check if the source of a multi-line string node is a single triple-quoted string literal,
+        i.e. it has no other triple quotes than its opening and closing ones.
+        """
+        opening: bytes = lines[node.lineno - 1][node.col_offset :].lstrip(
+            STRING_PREFIX_CHARACTERS
+        )
+        quote: bytes = opening[:3]
+        if quote not in TRIPLE_QUOTES:
+            return False
+        closing: bytes = lines[node.end_lineno - 1][: node.end_col_offset]
+        return (
+            closing.endswith(quote)
+            and opening.count(quote)
+            + sum(
+                line.count(quote) for line in lines[node.lineno : node.end_lineno - 1]
+            )
+            + closing.count(quote)
+            == 2
+        )
+
+    @staticmethod
+    def __classify_lines(
+        content: bytes,
+    ) -> Tuple[Set[int], Set[int]]:
+        """
+        Tokenize Python code content and return the numbers of the lines containing code and of those containing
+        comments. Strings forming a whole statement (docstrings) are comments, lines having both are code lines.
+        Only used for content whose lines cannot all be classified from the AST and the line starts.
+        """
+        code_lines: Set[int] = set()
+        comment_lines: Set[int] = set()
+        at_statement_start: bool = True
+        # Strings found at the start of a statement, which are docstrings if nothing else follows in the statement
+        statement_strings: List[tokenize.TokenInfo] = []
+
+        for token in tokenize.tokenize(io.BytesIO(content).readline):
+            token_type: int = token.type
+            if token_type == tokenize.COMMENT:
+                comment_lines.add(token.start[0])
+            elif token_type == tokenize.NEWLINE:
+                for string_token in statement_strings:
+                    comment_lines.update(
+                        range(string_token.start[0], string_token.end[0] + 1)
+                    )
+                statement_strings.clear()
+                at_statement_start = True
+            elif token_type in NON_CODE_TOKENS:
+                continue
+            elif token_type == tokenize.STRING and (
+                at_statement_start or statement_strings
+            ):
+                statement_strings.append(token)
+                at_statement_start = False
+            else:
+                for string_token in statement_strings:
+                    code_lines.update(
+                        range(string_token.start[0], string_token.end[0] + 1)
+                    )
+                statement_strings.clear()
+                code_lines.update(range(token.start[0], token.end[0] + 1))
+                at_statement_start = False
+
+        return code_lines, comment_lines
+
+    @staticmethod
+    def __calculate_metrics_from_lines(content: bytes) -> Dict[str, float]:
+        """
+        Calculate metrics with a line by line scan, for content which cannot be parsed as Python code.
+        Lines starting with triple quotes are treated as docstrings and methods are counted by their "def" lines.
+        Lines are classified by the first non-blank characters matched by LINE_START_RE, without copying them.
         """
-        lines: list[str] = content.split("\n")
-        total_lines: int = len(lines)
         comment_lines_count: int = 0
         code_lines_count: int = 0
-        method_cnt: int = 0
-
-        in_multiline_string: bool = False
-        multiline_quote: Optional[str] = None
-
-        for line in lines:
-            stripped: str = line.strip()
-
-            if not in_multiline_string:
-                if stripped.startswith('"""') or stripped.startswith("'''"):
-                    multiline_quote = stripped[:3]
-                    if stripped.count(multiline_quote) == 1:
-                        in_multiline_string = True
-                        comment_lines_count += 1
-                        continue
-                    if stripped.count(multiline_quote) >= 2:
-                        comment_lines_count += 1
-                        continue
-            else:
-                comment_lines_count += 1
-                if multiline_quote in stripped:
-                    in_multiline_string = False
-                    multiline_quote = None
-                continue
 
-            if stripped.startswith("#"):
+        content_length: int = len(content)
+        position: int = 0
+        while position <= content_length:
+            line_end: int = content.find(b"\n", position)
+            if line_end == -1:
+                line_end = content_length
+            line_start: re.Match[bytes] = LINE_START_RE.match(content, position)
+            kind: bytes = line_start.group(1)
+
+            if kind == b'"""' or kind == b"'''":
                 comment_lines_count += 1
-            elif stripped and not in_multiline_string:
+                if content.find(kind, line_start.end(), line_end) == -1:
+                    # Unclosed on this line: all lines up to the closing quotes are part of the docstring
+                    closing_quote: int = content.find(kind, line_end)
+                    if closing_quote == -1:
+                        comment_lines_count += content.count(b"\n", line_end)
+                        break
+                    comment_lines_count += content.count(b"\n", line_end, closing_quote)
+                    line_end = content.find(b"\n", closing_quote)
+                    if line_end == -1:
+                        break
+            elif kind == b"#":
+                comment_lines_count += 1
+            elif kind:
                 code_lines_count += 1
 
-        try:
-            tree: ast.AST = ast.parse(content)
-            method_cnt = PythonAnalyser.__count_functions_and_methods(tree)
-        except SyntaxError as syntax_error:
-            # Fallback if AST parsing fails
-            logger.debug(
-                "AST parsing failed for content (likely not Python or syntax error): %s. Using simple def count.",
-                syntax_error,
-            )
-            for line in lines:
-                stripped: str = line.strip()
-                if stripped.startswith("def ") and stripped.endswith(":"):
-                    method_cnt += 1
+            position = line_end + 1
 
         return {
             "loc": float(code_lines_count),
             "cloc": float(comment_lines_count),
-            "nom": float(method_cnt),
-            "tloc": float(total_lines),
+            "nom": float(len(DEF_RE.findall(content))),
+            "tloc": float(content.count(b"\n") + 1),
         }
 
-    @staticmethod
-    def __count_functions_and_methods(node: ast.AST) -> int:
-        """
-        Recursively count function and method definitions in the Python AST.
-        """
-        count: int = 0
-        for child in ast.walk(node):
-            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                count += 1
-        return count
-
     @classmethod
     def get_cli_parser(cls) -> argparse.ArgumentParser:
         """
@@ -385,4 +1033,11 @@ class PythonAnalyser(Analyser):
             default="*.test.py,*.spec.py,setup.py,*.tmp",
             help="Comma-separated list of filename patterns to exclude (e.g., '*.log,*.tmp'). Supports fnmatch.",
         )
+        parser.add_argument(
+            "--sorted",
+            action=argparse.BooleanOptionalAction,
+            default=True,
+            help="Sort the children of each folder by name. Use --no-sorted to skip sorting "
+            "when the output order does not matter.",
+        )
         return parser
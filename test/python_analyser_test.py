@@ -1,11 +1,18 @@
+import fnmatch
 import os
 import tempfile
 import unittest
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from unittest import mock
 
 from visualiser.schema.data import ProjectData, FileNode, FolderNode
 
-from python_analyser_plugin.python_analyser import PythonAnalyser
+from python_analyser_plugin.python_analyser import (
+    FOLDER_METRICS_SUPPORTED,
+    FilenamePatterns,
+    PythonAnalyser,
+)
 
 
 class TestPythonAnalyser(unittest.TestCase):
@@ -79,6 +86,48 @@ class TestClass:
         self.assertGreater(metrics["cloc"], 7)
         self.assertEqual(metrics["nom"], 3)  # 3 functions/methods (hello_world, method_one, async_method)
 
+    def test_analyse_multiline_string_is_not_docstring(self):
+        """Test that multi-line strings used as values are counted as code, not as docstrings."""
+        python_content = '''"""Module docstring."""
+TEMPLATE = """
+line one
+"""
+'''
+        (Path(self.temp_dir) / "template.py").write_text(python_content, encoding='utf-8')
+
+        result = self.analyser.analyse(self.temp_dir)
+
+        metrics = result.hierarchy.children[0].metrics
+        self.assertEqual(metrics["cloc"], 1)
+        self.assertEqual(metrics["loc"], 3)
+        self.assertEqual(metrics["tloc"], 5)
+
+    def test_analyse_lines_inside_strings_are_code(self):
+        """Test that blank and "#" lines inside multi-line strings are code, and comments inside docstrings."""
+        template_content = '''"""Module docstring.
+
+# still the docstring
+"""
+TEMPLATE = """
+# not a comment
+
+"""
+'''
+        # Blank lines inside a formatted string are left to the tokenizer
+        message_content = template_content + '''message = f"""
+
+{TEMPLATE}
+"""
+'''
+        (Path(self.temp_dir) / "message.py").write_text(message_content, encoding='utf-8')
+        (Path(self.temp_dir) / "template.py").write_text(template_content, encoding='utf-8')
+
+        result = self.analyser.analyse(self.temp_dir)
+
+        message_node, template_node = result.hierarchy.children
+        self.assertEqual(template_node.metrics, {"loc": 4, "cloc": 4, "nom": 0, "tloc": 9})
+        self.assertEqual(message_node.metrics, {"loc": 8, "cloc": 4, "nom": 0, "tloc": 13})
+
     def test_analyse_with_exclusions(self):
         """Test analysis with file and directory exclusions."""
         # Create directory structure
@@ -108,6 +157,75 @@ class TestClass:
         self.assertEqual(len(src_node.children), 1)
         self.assertEqual(src_node.children[0].name, "main.py")
 
+    @unittest.skipUnless(hasattr(os, "symlink"), "symlinks are not supported")
+    def test_analyse_follows_file_symlinks_only(self):
+        """Test that symlinked files are analysed, while symlinked directories are not walked."""
+        shared_dir = Path(self.temp_dir) / "shared"
+        src_dir = Path(self.temp_dir) / "src"
+        shared_dir.mkdir()
+        src_dir.mkdir()
+        (shared_dir / "helper.py").write_text("def helper(): pass", encoding='utf-8')
+        os.symlink(shared_dir / "helper.py", src_dir / "linked_helper.py")
+        os.symlink(shared_dir, src_dir / "linked_shared", target_is_directory=True)
+        # A symlink to an ancestor would create a cycle if it was followed
+        os.symlink(self.temp_dir, src_dir / "loop", target_is_directory=True)
+
+        result = self.analyser.analyse(self.temp_dir)
+
+        src_node = next(child for child in result.hierarchy.children if child.name == "src")
+        self.assertEqual([child.name for child in src_node.children], ["linked_helper.py"])
+        self.assertEqual(src_node.children[0].metrics["nom"], 1)
+
+    def test_exclude_directories_keeps_files_with_the_same_name(self):
+        """Test that directory exclusions only apply to directories."""
+        (Path(self.temp_dir) / "build").mkdir()
+        (Path(self.temp_dir) / "build" / "generated.py").write_text("def generated(): pass", encoding='utf-8')
+        (Path(self.temp_dir) / "keep.py").write_text("def keep(): pass", encoding='utf-8')
+
+        result = self.analyser.analyse(self.temp_dir, exclude_directories="build,keep.py")
+
+        self.assertEqual([child.name for child in result.hierarchy.children], ["keep.py"])
+
+    def test_analyse_with_filename_pattern_kinds(self):
+        """Test exclusions by literal name, suffix, bare wildcard and path patterns."""
+        generated_dir = Path(self.temp_dir) / "generated"
+        generated_dir.mkdir()
+        for name in ("setup.py", "main.py", "main.test.py"):
+            (Path(self.temp_dir) / name).write_text("def func(): pass", encoding='utf-8')
+        (generated_dir / "model.py").write_text("def func(): pass", encoding='utf-8')
+
+        cases = {
+            "setup.py": ["generated/model.py", "main.py", "main.test.py"],
+            "*.test.py": ["generated/model.py", "main.py", "setup.py"],
+            "*": [],
+            "*/generated/*.py": ["main.py", "main.test.py", "setup.py"],
+        }
+        for pattern, expected_files in cases.items():
+            with self.subTest(pattern):
+                result = self.analyser.analyse(self.temp_dir, exclude_filenames=pattern)
+
+                file_names = []
+                for child in result.hierarchy.children:
+                    if isinstance(child, FolderNode):
+                        file_names.extend(f"{child.name}/{grandchild.name}" for grandchild in child.children)
+                    else:
+                        file_names.append(child.name)
+                self.assertEqual(file_names, expected_files)
+
+    def test_filename_patterns_match_like_fnmatch(self):
+        """Test that compiled filename patterns match the same names and paths as fnmatch."""
+        patterns = ["setup.py", "*.test.py", "*", "test_*.py", "*/generated/*.py", "*.py[co]", "?.py"]
+        paths = ["setup.py", "src/setup.py", "a.test.py", "test_a.py", "x/generated/m.py", "m.pyc", "a.py", "ab.py"]
+        for pattern in patterns:
+            compiled = FilenamePatterns([pattern])
+            for path in paths:
+                name = os.path.basename(path)
+                with self.subTest(pattern=pattern, path=path):
+                    self.assertEqual(
+                        compiled.matches(name, path),
+                        fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern),
+                    )
+
     def test_analyse_empty_directory(self):
         """Test analysis of an empty directory."""
         result = self.analyser.analyse(self.temp_dir)
@@ -132,6 +250,22 @@ class TestClass:
         self.assertNotIn("cloc", metric_ids)
         self.assertNotIn("tloc", metric_ids)
 
+        # Files should only have the requested metrics
+        file_metrics = result.hierarchy.children[0].metrics
+        self.assertEqual(file_metrics, {"loc": 1, "nom": 1})
+
+    def test_analyse_single_file_path(self):
+        """Test that analysing a file path returns a file root with only the requested metrics."""
+        test_file = Path(self.temp_dir) / "simple.py"
+        test_file.write_text("# Comment\ndef func(): pass\n", encoding='utf-8')
+
+        result = self.analyser.analyse(str(test_file), metrics="loc,nom")
+
+        self.assertIsInstance(result.hierarchy, FileNode)
+        self.assertEqual(result.hierarchy.name, "simple.py")
+        self.assertEqual(result.hierarchy.metrics, {"loc": 1, "nom": 1})
+        self.assertEqual([m.id for m in result.metrics], ["loc", "nom"])
+
     def test_analyse_invalid_metrics(self):
         """Test that invalid metrics raise ValueError."""
         test_file = Path(self.temp_dir) / "simple.py"
@@ -165,6 +299,29 @@ class TestClass:
         self.assertEqual(len(utils_node.children), 1)
         self.assertEqual(utils_node.children[0].name, "helper.py")
 
+    @unittest.skipUnless(FOLDER_METRICS_SUPPORTED, "the feather-city schema has no folder metrics")
+    def test_analyse_folder_metrics_are_sums_of_children(self):
+        """Test that the metrics of each folder are the sums of the metrics of its children."""
+        utils_dir = Path(self.temp_dir) / "src" / "utils"
+        utils_dir.mkdir(parents=True)
+        (Path(self.temp_dir) / "setup_tools.py").write_text("# tools\ndef tool(): pass\n", encoding='utf-8')
+        (Path(self.temp_dir) / "src" / "main.py").write_text("def main():\n    pass\n", encoding='utf-8')
+        (utils_dir / "helper.py").write_text('"""Helpers."""\ndef first(): pass\ndef second(): pass\n', encoding='utf-8')
+
+        result = self.analyser.analyse(self.temp_dir)
+
+        def check_folder(folder_node):
+            expected = {"loc": 0, "cloc": 0, "nom": 0, "tloc": 0}
+            for child in folder_node.children:
+                if isinstance(child, FolderNode):
+                    check_folder(child)
+                for metric_id, value in child.metrics.items():
+                    expected[metric_id] += value
+            self.assertEqual(folder_node.metrics, expected, folder_node.name)
+
+        check_folder(result.hierarchy)
+        self.assertEqual(result.hierarchy.metrics, {"loc": 5, "cloc": 2, "nom": 4, "tloc": 10})
+
     def test_analyse_with_syntax_error_file(self):
         """Test analysis handles files with syntax errors gracefully."""
         # Create a Python file with syntax error
@@ -182,6 +339,42 @@ class TestClass:
         self.assertIn("tloc", file_node.metrics)
         self.assertEqual(file_node.metrics["nom"], 0)
 
+    def test_analyse_syntax_error_file_counts_async_methods(self):
+        """Test that the fallback method count of files with syntax errors includes async definitions."""
+        bad_file = Path(self.temp_dir) / "bad_async.py"
+        bad_file.write_text(
+            "def first(a):\n    pass\n\nasync def second(self, b=None) -> int:\n    return (\n",
+            encoding='utf-8'
+        )
+
+        result = self.analyser.analyse(self.temp_dir)
+
+        self.assertEqual(result.hierarchy.children[0].metrics["nom"], 2)
+
+    def test_analyse_binary_file_has_zero_metrics(self):
+        """Test that binary files with a .py extension are not parsed."""
+        (Path(self.temp_dir) / "binary.py").write_bytes(b"def func(): pass\n\x00\x01\x02")
+
+        result = self.analyser.analyse(self.temp_dir)
+
+        self.assertEqual(
+            result.hierarchy.children[0].metrics,
+            {"loc": 0, "cloc": 0, "nom": 0, "tloc": 0},
+        )
+
+    def test_analyse_oversized_file_only_counts_total_lines(self):
+        """Test that files over the size limit are not parsed, only their total lines are counted."""
+        (Path(self.temp_dir) / "generated.py").write_text("# generated\n" + "def func(): pass\n" * 10, encoding='utf-8')
+        (Path(self.temp_dir) / "small.py").write_text("def func(): pass\n", encoding='utf-8')
+
+        with mock.patch("python_analyser_plugin.python_analyser.MAX_ANALYSIS_FILE_SIZE", 100):
+            result = self.analyser.analyse(self.temp_dir, metrics="nom,tloc,loc")
+
+        generated_node, small_node = result.hierarchy.children
+        self.assertEqual(generated_node.metrics, {"nom": 0, "tloc": 12, "loc": 0})
+        self.assertEqual(list(generated_node.metrics), ["nom", "tloc", "loc"])
+        self.assertEqual(small_node.metrics, {"nom": 1, "tloc": 2, "loc": 1})
+
     def test_analyse_non_python_files_ignored(self):
         """Test that non-Python files are ignored."""
         # Create various file types
@@ -195,6 +388,66 @@ class TestClass:
         self.assertEqual(len(result.hierarchy.children), 1)
         self.assertEqual(result.hierarchy.children[0].name, "script.py")
 
+    def test_analyse_many_files_in_parallel(self):
+        """Test that projects large enough for parallel analysis keep every file and its metrics."""
+        src_dir = Path(self.temp_dir) / "src"
+        src_dir.mkdir()
+        for index in range(40):
+            (src_dir / f"module_{index:02d}.py").write_text(
+                "# comment\n" + "def func(): pass\n" * (index + 1), encoding='utf-8'
+            )
+
+        # The pool must be used, and must not fail over to the serial analysis which logs a warning
+        with mock.patch(
+            "python_analyser_plugin.python_analyser.ProcessPoolExecutor", wraps=ProcessPoolExecutor
+        ) as executor_class, self.assertNoLogs("python_analyser_plugin.python_analyser", level="WARNING"):
+            result = self.analyser.analyse(self.temp_dir)
+
+        executor_class.assert_called_once()
+        src_node = result.hierarchy.children[0]
+        self.assertEqual(len(src_node.children), 40)
+        for index, file_node in enumerate(src_node.children):
+            self.assertEqual(file_node.name, f"module_{index:02d}.py")
+            self.assertEqual(file_node.metrics["nom"], index + 1)
+            self.assertEqual(file_node.metrics["cloc"], 1)
+
+    def test_analyse_identical_files_get_separate_metrics(self):
+        """Test that identical files get equal metrics, without sharing the cached dictionary."""
+        for package in ("first", "second"):
+            (Path(self.temp_dir) / package).mkdir()
+            (Path(self.temp_dir) / package / "__init__.py").write_text("", encoding='utf-8')
+
+        result = self.analyser.analyse(self.temp_dir)
+
+        first_metrics, second_metrics = (folder.children[0].metrics for folder in result.hierarchy.children)
+        self.assertEqual(first_metrics, {"loc": 0, "cloc": 0, "nom": 0, "tloc": 1})
+        self.assertEqual(first_metrics, second_metrics)
+        self.assertIsNot(first_metrics, second_metrics)
+
+    def test_analyse_again_with_other_metrics(self):
+        """Test that cached metrics of a previous analysis never leak into one requesting other metrics."""
+        for index in range(20):
+            (Path(self.temp_dir) / f"module_{index:02d}.py").write_text("def func(): pass\n", encoding='utf-8')
+
+        for path, min_files in (("serial", 100), ("parallel", 1)):
+            with self.subTest(path), mock.patch("python_analyser_plugin.python_analyser.PARALLEL_MIN_FILES", min_files):
+                self.analyser.analyse(self.temp_dir, metrics="loc,cloc")
+                result = PythonAnalyser().analyse(self.temp_dir, metrics="nom")
+
+                for file_node in result.hierarchy.children:
+                    self.assertEqual(file_node.metrics, {"nom": 1})
+
+    def test_analyse_unsorted(self):
+        """Test that disabling sorting keeps all files, in any order."""
+        for name in ("c.py", "a.py", "b.py"):
+            (Path(self.temp_dir) / name).write_text("def func(): pass", encoding='utf-8')
+
+        sorted_result = self.analyser.analyse(self.temp_dir)
+        unsorted_result = self.analyser.analyse(self.temp_dir, sorted=False)
+
+        self.assertEqual([child.name for child in sorted_result.hierarchy.children], ["a.py", "b.py", "c.py"])
+        self.assertCountEqual([child.name for child in unsorted_result.hierarchy.children], ["a.py", "b.py", "c.py"])
+
     def test_custom_title_and_description(self):
         """Test analysis with custom title and description."""
         test_file = Path(self.temp_dir) / "simple.py"